@@ -1,13 +1,18 @@
 import streamlit as st
 import re
-import pandas as pd
 import numpy as np
-import json
+import orjson
 import os
-import plotly.express as px
-import plotly.graph_objects as go
+import pickle
+import uuid
+import asyncio
+import hashlib
+import functools
+import threading
+import types
+from collections import deque
 from datetime import datetime
-from openai import OpenAI
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 from dotenv import load_dotenv
 
 # Set page configuration
@@ -21,60 +26,523 @@ st.set_page_config(
 # Load API key for OpenAI
 load_dotenv()  # Load environment variables from .env file
 
-# Explicitly set API key
-api_key = os.getenv("OPENAI_API_KEY")
+# Seconds an idle API connection stays open for reuse
+KEEPALIVE_EXPIRY = 120
 
-# Initialize OpenAI client with API key
-try:
-    client = OpenAI(api_key=api_key)
-except Exception as e:
-    st.error(f"Error initializing OpenAI client: {str(e)}")
-    client = None
+def _http_limits():
+    """Connection pool limits shared by the synchronous and async API clients"""
+    import httpx
+    # Keep idle connections open between chat turns so follow-up requests skip the TCP/TLS handshake
+    return httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=KEEPALIVE_EXPIRY)
+
+@st.cache_resource
+def get_openai_client():
+    """Create the OpenAI client once per process so its connection pool is reused across reruns"""
+    # Imported here so pages that never call the API don't pay the import cost
+    import httpx
+    from openai import OpenAI
+    
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=httpx.Client(limits=_http_limits()))
+
+@st.cache_resource
+def _async_runtime():
+    """Start the event loop thread for concurrent requests, with an async client bound to that loop
+    
+    Async connections belong to the loop that opened them, so one long-lived
+    loop lets the client keep its pool across batches.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+    
+    # Build the client before starting the thread: a failure isn't cached, so a thread
+    # started first would be left running on every retry
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=httpx.AsyncClient(limits=_http_limits()))
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="openai-async", daemon=True).start()
+    return loop, client
+
+# Maximum number of OpenAI requests in flight at once, across all sessions
+MAX_CONCURRENT_REQUESTS = 2
+
+@st.cache_resource
+def _inflight_semaphore():
+    """Create the process-wide gate that caps concurrent OpenAI requests"""
+    return threading.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+def _is_rate_limit_error(e):
+    """Check for an OpenAI rate limit error without importing openai at module load"""
+    import openai
+    return isinstance(e, openai.RateLimitError)
+
+_retry_on_rate_limit = retry(
+    wait=wait_random_exponential(min=1, max=30),
+    stop=stop_after_attempt(4),
+    retry=retry_if_exception(_is_rate_limit_error),
+    reraise=True
+)
+
+@_retry_on_rate_limit
+def _create_completion(**kwargs):
+    """Create a chat completion, retrying with exponential backoff on rate limits"""
+    # The gate is held per attempt so backoff sleeps don't block other requests;
+    # for streamed completions it covers the request up to the first response bytes
+    with _inflight_semaphore():
+        return get_openai_client().chat.completions.create(**kwargs)
+
+@_retry_on_rate_limit
+def _create_embedding(**kwargs):
+    """Create embeddings, retrying with exponential backoff on rate limits"""
+    with _inflight_semaphore():
+        return get_openai_client().embeddings.create(**kwargs)
+
+@_retry_on_rate_limit
+async def _create_completion_async(client, gate, **kwargs):
+    """Create a chat completion on the async client, under the same gate and retry policy as _create_completion"""
+    # The process-wide gate is a threading semaphore, so wait for it off the event loop
+    await asyncio.to_thread(gate.acquire)
+    try:
+        return await client.chat.completions.create(**kwargs)
+    finally:
+        gate.release()
 
 # Functions for JSON processing and information extraction
+# Defaults used to fill missing or invalid loan and credit card fields
+LOAN_DEFAULTS = {
+    "type": "Loan",
+    "lender": "Unknown",
+    "amount": 0,
+    "current_balance": 0,
+    "emi": 0,
+    "interest_rate": 0,
+    "tenure": 0,
+    "remaining_tenure": 0
+}
+
+CARD_DEFAULTS = {
+    "issuer": "Unknown",
+    "limit": 0,
+    "outstanding": 0,
+    "minimum_due": 0
+}
+
+def _normalize_record(record, defaults):
+    """Return a copy of a loan/card record with every field present and numeric fields numeric"""
+    normalized = {}
+    for key, default in defaults.items():
+        value = record.get(key)
+        if isinstance(default, str):
+            normalized[key] = value if value is not None else default
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            normalized[key] = value
+        else:
+            normalized[key] = default
+    return normalized
+
+def _normalize_loan(loan):
+    """Fill default values for a single loan"""
+    return _normalize_record(loan, LOAN_DEFAULTS)
+
+def _normalize_card(card):
+    """Fill default values for a single credit card"""
+    return _normalize_record(card, CARD_DEFAULTS)
+
 def extract_credit_info(credit_data):
     """Extract credit information from the JSON data"""
-    # Simply return the data as it's already in the right format
-    return credit_data
+    # Normalize loans and cards once here so downstream code needs no None checks
+    credit_info = dict(credit_data)
+    credit_info['loans'] = [_normalize_loan(loan) for loan in credit_data.get('loans') or [] if isinstance(loan, dict)]
+    credit_info['credit_cards'] = [_normalize_card(card) for card in credit_data.get('credit_cards') or [] if isinstance(card, dict)]
+    
+    # Monthly statuses are 0 (on time), 1 (30 days late) or 2 (60 days late), so int8 is enough
+    payment_history = credit_data.get('payment_history') or [0] * 12
+    credit_info['payment_history'] = np.asarray(
+        [status if isinstance(status, (int, float)) else 0 for status in payment_history], dtype=np.int8)
+    return credit_info
+
+def build_debt_arrays(credit_info):
+    """Collect loan EMIs and card minimum dues of normalized credit info into float64 arrays"""
+    loans = credit_info["loans"]
+    credit_cards = credit_info["credit_cards"]
+    emi_arr = np.fromiter((loan["emi"] for loan in loans), dtype=np.float64, count=len(loans))
+    min_due_arr = np.fromiter((card["minimum_due"] for card in credit_cards), dtype=np.float64, count=len(credit_cards))
+    return emi_arr, min_due_arr
+
+def apply_budget_rule(income):
+    """Apply 50-30-20 budget rule"""
+    return {
+        "essentials": income * 0.5,
+        "wants": income * 0.3,
+        "savings": income * 0.2
+    }
+
+@functools.lru_cache(maxsize=4096)
+def _emi(principal, rate_bps, tenure_years):
+    """Calculate the EMI and total interest of a loan whose annual rate is given in basis points
+    
+    Integer arguments keep the cache keys exact for slider values.
+    """
+    monthly_interest_rate = rate_bps / 120000
+    tenure_months = tenure_years * 12
+    
+    if monthly_interest_rate == 0:
+        emi = principal / tenure_months
+    else:
+        growth = (1 + monthly_interest_rate) ** tenure_months
+        emi = principal * monthly_interest_rate * growth / (growth - 1)
+    return emi, emi * tenure_months - principal
+
+def emi_schedule(principal, rate_bps, tenure_years):
+    """Calculate EMI, total interest and the month-end outstanding balance of a loan
+    
+    The annual rate is in basis points; EMI and total interest come from _emi,
+    so the schedule always matches the calculator figures. Returns (emi,
+    total_interest, balance) where balance[k] is the balance after the
+    (k + 1)th payment.
+    """
+    emi, total_interest = _emi(principal, rate_bps, tenure_years)
+    monthly_interest_rate = rate_bps / 120000
+    months = np.arange(1, tenure_years * 12 + 1)
+    
+    if monthly_interest_rate == 0:
+        balance = principal - emi * months
+    else:
+        # Closed-form balance after each payment, computed for all months at once
+        growth = (1 + monthly_interest_rate) ** months
+        balance = principal * growth - emi * (growth - 1) / monthly_interest_rate
+    
+    return emi, total_interest, np.maximum(balance, 0)
+
+def compute_debt_metrics(emi_arr, min_due_arr, income):
+    """Compute monthly debt obligations, debt-to-income ratio and 50-30-20 allocation"""
+    total_emi = float(emi_arr.sum())
+    card_minimum_dues = float(min_due_arr.sum())
+    monthly_debt = total_emi + card_minimum_dues
+    
+    if not isinstance(income, (int, float)) or income <= 0:
+        income = None
+    debt_to_income_ratio = (monthly_debt / income) * 100 if income else 0
+    
+    return {
+        "income": income,
+        "total_emi": total_emi,
+        "card_minimum_dues": card_minimum_dues,
+        "monthly_debt": monthly_debt,
+        "debt_to_income_ratio": debt_to_income_ratio,
+        # Without a reported income, allocate the default income used for display
+        **apply_budget_rule(income or 50000)
+    }
+
+def canonical_credit_json(credit_info):
+    """Serialize a normalized profile with sorted keys, so equal profiles give identical strings"""
+    return orjson.dumps(credit_info, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+def store_credit_info(credit_data):
+    """Normalize a credit report and store it in session state with its debt metrics"""
+    credit_info = extract_credit_info(credit_data)
+    st.session_state.credit_info = credit_info
+    st.session_state.metrics = compute_debt_metrics(*build_debt_arrays(credit_info), credit_info.get("income"))
+    st.session_state.credit_info_json = canonical_credit_json(credit_info)
+    
+    # Precomputed answers to the common questions are specific to the previous report
+    st.session_state.pop("common_answers", None)
+    return credit_info
+
+def summary_tiles(credit_info, metrics):
+    """Build the keyword arguments for the four Home summary st.metric tiles"""
+    credit_score = credit_info.get('credit_score')
+    if credit_score is not None:
+        credit_tile = {"label": "Credit Score", "value": f"{credit_score}",
+                       "delta": "Excellent" if credit_score >= 750 else
+                                "Good" if credit_score >= 700 else
+                                "Fair" if credit_score >= 650 else "Poor"}
+    else:
+        credit_tile = {"label": "Credit Score", "value": "N/A", "delta": "Unknown"}
+    
+    income = metrics["income"]
+    income_tile = {"label": "Monthly Income", "value": f"₹{income:,}" if income else "N/A"}
+    
+    emi_tile = {"label": "Total Monthly EMIs", "value": f"₹{metrics['total_emi']:,.0f}"}
+    
+    debt_to_income_ratio = metrics["debt_to_income_ratio"]
+    dti_tile = {"label": "Debt-to-Income Ratio", "value": f"{debt_to_income_ratio:.1f}%",
+                "delta": "Healthy" if debt_to_income_ratio <= 40 else
+                         "Moderate" if debt_to_income_ratio <= 60 else "High",
+                "delta_color": "normal" if debt_to_income_ratio <= 40 else
+                               "off" if debt_to_income_ratio <= 60 else "inverse"}
+    
+    return [credit_tile, income_tile, emi_tile, dti_tile]
 
 # Functions for ChatGPT integration
-def get_chatgpt_response(prompt):
+CHAT_MODEL = "gpt-3.5-turbo"
+
+# Completed responses are kept on disk so new sessions and app restarts reuse them
+RESPONSE_CACHE_DIR = ".llm_cache"
+RESPONSE_CACHE_TTL = 86400
+
+SYSTEM_PROMPT = "You are a knowledgeable financial advisor who specializes in credit analysis and personal finance for Indian customers. You provide detailed, data-driven advice with calculations and reasoning. Format your responses in bullet points with clear headers."
+
+def _chat_messages(prompt, context=None):
+    """Build the message list sent to the chat completions API
+    
+    Context shared by several requests is appended to the system message, so
+    their messages start identically and only the user question differs. At a
+    few hundred tokens this is well below the 1024-token minimum for the API's
+    automatic prompt caching, so no cached prefix is used at the current size.
+    """
+    system_prompt = f"{SYSTEM_PROMPT}\n\n{context}" if context else SYSTEM_PROMPT
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def _api_error_message(e):
+    """Report an API error and return a user-facing fallback message"""
+    error_msg = str(e)
+    st.error(f"Error in API call: {error_msg}")
+    
+    # Handle common API errors
+    if "API key" in error_msg:
+        return "Unable to connect to OpenAI API. Please check your API key configuration."
+    elif "rate limit" in error_msg.lower():
+        return "OpenAI API rate limit exceeded. Please try again later."
+    else:
+        return "I apologize, but I'm unable to provide an analysis at the moment. Please try again later."
+
+@st.cache_resource
+def _response_cache():
+    """Open the on-disk response cache shared by all sessions"""
+    import diskcache
+    return diskcache.Cache(RESPONSE_CACHE_DIR)
+
+def _response_key(prompt, json_mode=False, max_tokens=1500, context=None):
+    """Content-address a request by hashing everything that determines its response"""
+    payload = orjson.dumps([CHAT_MODEL, SYSTEM_PROMPT, context, prompt, json_mode, max_tokens])
+    return hashlib.blake2b(payload, digest_size=32).hexdigest()
+
+class _UncachedResponse(Exception):
+    """Carries a response out of _cached_completion without letting st.cache_data store it"""
+    def __init__(self, content):
+        super().__init__("Response was truncated or malformed")
+        self.content = content
+
+def _is_cacheable(content, finish_reason, json_mode=False):
+    """Check that a response ran to completion and, in JSON mode, parses"""
+    if content is None or finish_reason == "length":
+        return False
+    if json_mode:
+        try:
+            orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return False
+    return True
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_completion(prompt, json_mode=False, max_tokens=1500):
+    """Get a completion for the prompt, cached so identical prompts skip the API call"""
+    # Memory cache misses fall back to the disk cache before calling the API
+    key = _response_key(prompt, json_mode, max_tokens)
+    content = _response_cache().get(key)
+    if content is not None:
+        return content
+    
+    response = _create_completion(
+        model=CHAT_MODEL,
+        messages=_chat_messages(prompt),
+        temperature=0.7,
+        max_tokens=max_tokens,
+        response_format={"type": "json_object" if json_mode else "text"}
+    )
+    choice = response.choices[0]
+    content = choice.message.content
+    
+    # Truncated or malformed responses are returned once but cached in neither layer
+    if not _is_cacheable(content, choice.finish_reason, json_mode):
+        raise _UncachedResponse(content)
+    _response_cache().set(key, content, expire=RESPONSE_CACHE_TTL)
+    return content
+
+def get_chatgpt_response(prompt, json_mode=False, max_tokens=1500):
     """Get response from ChatGPT API"""
-    if client is None:
+    try:
+        get_openai_client()
+    except Exception as e:
+        st.error(f"Error initializing OpenAI client: {str(e)}")
         return "OpenAI client is not available. Please check your API key configuration."
         
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a knowledgeable financial advisor who specializes in credit analysis and personal finance for Indian customers. You provide detailed, data-driven advice with calculations and reasoning. Format your responses in bullet points with clear headers."},
-                {"role": "user", "content": prompt}
-            ],
+        # Failed calls raise before reaching the cache, so fallback messages are never cached
+        return _cached_completion(prompt, json_mode, max_tokens)
+    except _UncachedResponse as e:
+        return e.content or ""
+    except Exception as e:
+        return _api_error_message(e)
+
+def stream_chatgpt_response(prompt, refresh=False, context=None):
+    """Stream response from ChatGPT API, yielding text as tokens arrive
+    
+    A cached response is yielded whole unless refresh is set; a completed
+    stream replaces the cached response.
+    """
+    key = _response_key(prompt, context=context)
+    if not refresh:
+        content = _response_cache().get(key)
+        if content is not None:
+            yield content
+            return
+    
+    try:
+        get_openai_client()
+    except Exception as e:
+        st.error(f"Error initializing OpenAI client: {str(e)}")
+        yield "OpenAI client is not available. Please check your API key configuration."
+        return
+    
+    try:
+        stream = _create_completion(
+            model=CHAT_MODEL,
+            messages=_chat_messages(prompt, context),
+            temperature=0.7,
+            max_tokens=1500,
+            stream=True
+        )
+        pieces = []
+        finish_reason = None
+        for chunk in stream:
+            if chunk.choices:
+                piece = chunk.choices[0].delta.content or ""
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                pieces.append(piece)
+                yield piece
+    except Exception as e:
+        yield _api_error_message(e)
+        return
+    
+    content = "".join(pieces)
+    if _is_cacheable(content, finish_reason):
+        _response_cache().set(key, content, expire=RESPONSE_CACHE_TTL)
+
+async def _complete_all_async(client, gate, prompts, context=None):
+    """Request completions for all prompts concurrently, returning a result or exception per prompt"""
+    async def complete(prompt):
+        response = await _create_completion_async(
+            client,
+            gate,
+            model=CHAT_MODEL,
+            messages=_chat_messages(prompt, context),
             temperature=0.7,
             max_tokens=1500
         )
         return response.choices[0].message.content
-    except Exception as e:
-        error_msg = str(e)
-        st.error(f"Error in API call: {error_msg}")
+    
+    return await asyncio.gather(*(complete(prompt) for prompt in prompts), return_exceptions=True)
+
+def complete_all(prompts, context=None):
+    """Get responses for several prompts, requesting the uncached ones concurrently
+    
+    Returns a list with the response to each prompt, or None where the
+    request failed so the caller can retry it on its own.
+    """
+    cache = _response_cache()
+    keys = [_response_key(prompt, context=context) for prompt in prompts]
+    responses = [cache.get(key) for key in keys]
+    missing = [index for index, response in enumerate(responses) if response is None]
+    
+    if missing:
+        try:
+            loop, client = _async_runtime()
+            batch = _complete_all_async(client, _inflight_semaphore(), [prompts[index] for index in missing], context)
+            results = asyncio.run_coroutine_threadsafe(batch, loop).result()
+        except Exception as e:
+            print(f"Error requesting concurrent completions: {str(e)}")
+            return responses
         
-        # Handle common API errors
-        if "API key" in error_msg:
-            return "Unable to connect to OpenAI API. Please check your API key configuration."
-        elif "rate limit" in error_msg.lower():
-            return "OpenAI API rate limit exceeded. Please try again later."
-        else:
-            return "I apologize, but I'm unable to provide an analysis at the moment. Please try again later."
+        for index, result in zip(missing, results):
+            if isinstance(result, str):
+                cache.set(keys[index], result, expire=RESPONSE_CACHE_TTL)
+                responses[index] = result
+    
+    return responses
 
-def analyze_credit_score(credit_info):
-    """Analyze credit score and provide recommendations"""
+# Semantic cache: advisor questions are embedded with this model, and one whose
+# embedding is at least SEMANTIC_CACHE_THRESHOLD similar to an answered question
+# reuses its answer; at most SEMANTIC_CACHE_LIMIT answers are kept per profile
+EMBEDDING_MODEL = "text-embedding-3-small"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_LIMIT = 200
+
+def _embed(texts):
+    """Embed texts as unit-length rows, so dot products are cosine similarities"""
+    response = _create_embedding(model=EMBEDDING_MODEL, input=list(texts))
+    embeddings = np.array([item.embedding for item in response.data], dtype=np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+def _semantic_key(context):
+    """Key the semantic cache entries of one context, so answers are only reused for the same profile"""
+    payload = orjson.dumps(["semantic", EMBEDDING_MODEL, CHAT_MODEL, SYSTEM_PROMPT, context])
+    return hashlib.blake2b(payload, digest_size=32).hexdigest()
+
+def semantic_lookup(question, context=None):
+    """Find the cached answer to the most similar question asked with the same context
+    
+    Returns (answer, embedding); answer is None on a miss and embedding is
+    None if the question could not be embedded.
+    """
+    try:
+        embedding = _embed([question])[0]
+    except Exception as e:
+        print(f"Error embedding question: {str(e)}")
+        return None, None
+    
+    entry = _response_cache().get(_semantic_key(context))
+    if entry is None:
+        return None, embedding
+    
+    similarities = entry["embeddings"] @ embedding
+    best = int(similarities.argmax())
+    if similarities[best] < SEMANTIC_CACHE_THRESHOLD:
+        return None, embedding
+    return entry["answers"][best], embedding
+
+def semantic_store(questions, embeddings, answers, context=None):
+    """Add answered questions to the semantic cache for the context, keeping the newest entries"""
+    cache = _response_cache()
+    key = _semantic_key(context)
+    entry = cache.get(key) or {"questions": [], "embeddings": np.empty((0, embeddings.shape[1]), np.float32), "answers": []}
+    
+    # Replace earlier answers to the same questions
+    keep = [index for index, question in enumerate(entry["questions"]) if question not in questions]
+    entry = {
+        "questions": ([entry["questions"][index] for index in keep] + list(questions))[-SEMANTIC_CACHE_LIMIT:],
+        "embeddings": np.vstack([entry["embeddings"][keep], embeddings])[-SEMANTIC_CACHE_LIMIT:],
+        "answers": ([entry["answers"][index] for index in keep] + list(answers))[-SEMANTIC_CACHE_LIMIT:]
+    }
+    cache.set(key, entry, expire=RESPONSE_CACHE_TTL)
+
+# Loans/cards embedded individually in a prompt; any beyond this are summarized
+PROMPT_RECORD_LIMIT = 10
+
+def _compact_records(records, total_key, total_label):
+    """Serialize normalized loan/card records compactly for a prompt
+    
+    Zero-valued fields are dropped and records past PROMPT_RECORD_LIMIT are
+    summarized as a count and a total of total_key.
+    """
+    compact = [{key: value for key, value in record.items() if value} for record in records[:PROMPT_RECORD_LIMIT]]
+    text = orjson.dumps(compact).decode()
+    remaining = records[PROMPT_RECORD_LIMIT:]
+    if remaining:
+        total = sum(record[total_key] for record in remaining)
+        text += f" …{len(remaining)} more totaling ₹{total:,.0f} {total_label}"
+    return text
+
+def _credit_score_prompt(credit_info):
+    """Build the prompt for the credit score analysis"""
     # Create a safe copy of credit_info with default values for None
     safe_info = {
         'credit_score': credit_info.get('credit_score', 700),
         'income': credit_info.get('income', 50000),
         'loans': credit_info.get('loans', []),
         'credit_cards': credit_info.get('credit_cards', []),
-        'payment_history': credit_info.get('payment_history', [0] * 12),
         'inquiries': credit_info.get('inquiries', 0)
     }
     
@@ -85,11 +553,16 @@ def analyze_credit_score(credit_info):
                 safe_info[key] = 700
             elif key in ['income']:
                 safe_info[key] = 50000
-            elif key in ['loans', 'credit_cards', 'payment_history']:
+            elif key in ['loans', 'credit_cards']:
                 safe_info[key] = []
             elif key in ['inquiries']:
                 safe_info[key] = 0
     
+    # Summarize payment history as counts rather than the raw monthly statuses
+    payment_history = credit_info['payment_history']
+    late_count = int((payment_history > 0).sum())
+    severe_late = int((payment_history >= 2).sum())
+    
     prompt = f"""
     As a financial advisor, analyze this credit profile and explain why the credit score is at its current level, what benefits it provides, and what financial products/services the person might qualify for:
     
@@ -97,7 +570,7 @@ def analyze_credit_score(credit_info):
     Monthly Income: ₹{safe_info['income']}
     Number of Active Loans: {len(safe_info['loans'])}
     Active Credit Cards: {len(safe_info['credit_cards'])}
-    Payment History (0=on time, 1=30 days late, 2=60 days late): {safe_info['payment_history']}
+    Payment History (last {len(payment_history)} months): {late_count} late payments, {severe_late} of them 60+ days late
     Recent Credit Inquiries (last 6 months): {safe_info['inquiries']}
     
     Please structure your response with clear headings and bullet points. Include:
@@ -106,66 +579,38 @@ def analyze_credit_score(credit_info):
     3. How they could improve their score if needed
     4. Make your explanations very detailed, with clear reasoning
     """
-    return get_chatgpt_response(prompt)
+    return prompt
 
-def analyze_emi_affordability(credit_info):
-    """Analyze EMI affordability and provide recommendations"""
-    # Create safe copies with default values
-    loans = credit_info.get('loans', [])
-    credit_cards = credit_info.get('credit_cards', [])
-    income = credit_info.get('income', 50000)
-    
-    if income is None:
-        income = 50000
+def analyze_credit_score(credit_info, refresh=False):
+    """Analyze credit score and provide recommendations"""
+    return stream_chatgpt_response(_credit_score_prompt(credit_info), refresh)
+
+def _emi_affordability_prompt(credit_info, metrics):
+    """Build the prompt for the EMI affordability analysis from the report's stored debt metrics"""
+    # Loans and cards are normalized at upload time
+    loans = credit_info['loans']
+    credit_cards = credit_info['credit_cards']
+    income = metrics['income'] or 50000
     
-    total_emi = sum(loan.get('emi', 0) for loan in loans)
-    card_minimum_dues = sum(card.get('minimum_due', 0) for card in credit_cards)
-    monthly_debt = total_emi + card_minimum_dues
-    debt_to_income_ratio = (monthly_debt / income) * 100 if income > 0 else 0
-    
-    # Make safe copies for the JSON
-    safe_loans = []
-    for loan in loans:
-        if loan is None:
-            continue
-        safe_loan = {
-            "type": loan.get("type", "Loan"),
-            "lender": loan.get("lender", "Unknown"),
-            "amount": loan.get("amount", 0),
-            "current_balance": loan.get("current_balance", 0),
-            "emi": loan.get("emi", 0),
-            "interest_rate": loan.get("interest_rate", 0),
-            "tenure": loan.get("tenure", 0),
-            "remaining_tenure": loan.get("remaining_tenure", 0)
-        }
-        safe_loans.append(safe_loan)
-    
-    safe_cards = []
-    for card in credit_cards:
-        if card is None:
-            continue
-        safe_card = {
-            "issuer": card.get("issuer", "Unknown"),
-            "limit": card.get("limit", 0),
-            "outstanding": card.get("outstanding", 0),
-            "minimum_due": card.get("minimum_due", 0)
-        }
-        safe_cards.append(safe_card)
+    total_emi = metrics['total_emi']
+    card_minimum_dues = metrics['card_minimum_dues']
+    monthly_debt = metrics['monthly_debt']
+    debt_to_income_ratio = (monthly_debt / income) * 100
     
     prompt = f"""
     As a financial advisor, analyze this person's EMI affordability and provide detailed advice:
     
     Monthly Income: ₹{income:,}
-    Current Monthly EMI Payments: ₹{total_emi:,}
-    Credit Card Minimum Dues: ₹{card_minimum_dues:,}
-    Total Monthly Debt Obligations: ₹{monthly_debt:,}
+    Current Monthly EMI Payments: ₹{total_emi:,.0f}
+    Credit Card Minimum Dues: ₹{card_minimum_dues:,.0f}
+    Total Monthly Debt Obligations: ₹{monthly_debt:,.0f}
     Debt-to-Income Ratio: {debt_to_income_ratio:.2f}%
     
     Loan Details:
-    {json.dumps(safe_loans, indent=2)}
+    {_compact_records(loans, "emi", "in monthly EMIs")}
     
     Credit Card Details:
-    {json.dumps(safe_cards, indent=2)}
+    {_compact_records(credit_cards, "outstanding", "outstanding")}
     
     Please provide:
     1. A detailed analysis of whether their current EMIs are affordable based on the 50-30-20 rule or other financial principles
@@ -178,10 +623,14 @@ def analyze_emi_affordability(credit_info):
     
     Format your response with clear headings and bullet points.
     """
-    return get_chatgpt_response(prompt)
+    return prompt
 
-def recommend_credit_cards(credit_info, preferences):
-    """Recommend credit cards based on user profile and preferences"""
+def analyze_emi_affordability(credit_info, metrics, refresh=False):
+    """Analyze EMI affordability and provide recommendations"""
+    return stream_chatgpt_response(_emi_affordability_prompt(credit_info, metrics), refresh)
+
+def _card_recommendation_prompt(credit_info, preferences):
+    """Build the prompt for the credit card recommendations"""
     # Get safe values with defaults
     credit_score = credit_info.get('credit_score', 700)
     income = credit_info.get('income', 50000)
@@ -195,7 +644,8 @@ def recommend_credit_cards(credit_info, preferences):
     if credit_cards is None:
         credit_cards = []
     
-    preference_str = ", ".join(preferences) if preferences else "general purpose"
+    # Order-independent, so reordered selections produce the same prompt and cache key
+    preference_str = ", ".join(sorted(frozenset(preferences))) if preferences else "general purpose"
     
     prompt = f"""
     As a financial advisor in India, recommend appropriate credit cards for a person with this profile:
@@ -215,64 +665,100 @@ def recommend_credit_cards(credit_info, preferences):
     Format your response with clear headings and bullet points for readability.
     Include detailed reasons for each recommendation based on their income and credit profile.
     """
-    return get_chatgpt_response(prompt)
+    return prompt
+
+# Shown instead of AI recommendations when there are no preferences to personalize for
+NO_CARD_PREFERENCES_MESSAGE = "Select one or more card preferences above to get personalized credit card recommendations."
+
+def recommend_credit_cards(credit_info, preferences, refresh=False):
+    """Recommend credit cards based on user profile and preferences"""
+    return stream_chatgpt_response(_card_recommendation_prompt(credit_info, preferences), refresh)
+
+# Order of the analyses returned by analyze_all and analyze_separately
+ANALYSIS_NAMES = ("credit", "emi", "cards")
+
+def _analysis_prompts(credit_info, metrics, preferences, names=ANALYSIS_NAMES):
+    """Build the prompts of the named analyses, keyed by analysis name
+    
+    The card analysis is left out without preferences, since there is nothing
+    to personalize and the tab doesn't show it.
+    """
+    prompts = {}
+    if "credit" in names:
+        prompts["credit"] = _credit_score_prompt(credit_info)
+    if "emi" in names:
+        prompts["emi"] = _emi_affordability_prompt(credit_info, metrics)
+    if "cards" in names and preferences:
+        prompts["cards"] = _card_recommendation_prompt(credit_info, preferences)
+    return prompts
+
+def analyze_all(credit_info, metrics, preferences, names=ANALYSIS_NAMES):
+    """Run the named credit score, EMI and card analyses in a single API call
+    
+    Returns a (credit score, EMI, card) tuple of analyses, with None for an
+    analysis that wasn't requested, or None if the combined response could
+    not be parsed.
+    """
+    prompts = _analysis_prompts(credit_info, metrics, preferences, names)
+    if not prompts:
+        return (None,) * len(ANALYSIS_NAMES)
+    
+    keys = ", ".join(f'"{name}"' for name in prompts)
+    tasks = "\n    \n    ".join(f'Task "{name}":\n    {task}' for name, task in prompts.items())
+    prompt = f"""
+    Complete the tasks below for the same person. Respond with a JSON object with exactly the keys {keys}, each holding the complete answer to that task as a Markdown string.
+    
+    {tasks}
+    """
+    response = get_chatgpt_response(prompt, json_mode=True, max_tokens=min(4000, 1500 * len(prompts)))
+    try:
+        sections = orjson.loads(response)
+        analyses = {name: sections[name] for name in prompts}
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        return None
+    if not all(isinstance(analysis, str) for analysis in analyses.values()):
+        return None
+    return tuple(analyses.get(name) for name in ANALYSIS_NAMES)
+
+def analyze_separately(credit_info, metrics, preferences, names=ANALYSIS_NAMES):
+    """Run the named credit score, EMI and card analyses as concurrent API calls
+    
+    Returns a (credit score, EMI, card) tuple with None for any analysis
+    that wasn't requested or whose request failed.
+    """
+    prompts = _analysis_prompts(credit_info, metrics, preferences, names)
+    analyses = dict(zip(prompts, complete_all(list(prompts.values()))))
+    return tuple(analyses.get(name) for name in ANALYSIS_NAMES)
 
-def provide_financial_advice(credit_info, user_query):
-    """Provide personalized financial advice based on user query"""
+@st.cache_data(max_entries=64, show_spinner=False)
+def _advisor_context(credit_info_json):
+    """Build the financial advisor instructions and profile shared by every question
+    
+    Keyed by the canonical profile JSON, so it is built once per report and
+    is byte-identical across chat turns and reruns.
+    """
+    credit_info = orjson.loads(credit_info_json)
+    
     # Get safe values with defaults
     credit_score = credit_info.get('credit_score', 700)
     income = credit_info.get('income', 50000)
-    loans = credit_info.get('loans', [])
-    credit_cards = credit_info.get('credit_cards', [])
+    # Loans and cards are normalized at upload time
+    loans = credit_info['loans']
+    credit_cards = credit_info['credit_cards']
     
     # Handle None values
     if credit_score is None:
         credit_score = 700
     if income is None:
         income = 50000
-    if loans is None:
-        loans = []
-    if credit_cards is None:
-        credit_cards = []
-    
-    # Make safe copies for the JSON
-    safe_loans = []
-    for loan in loans:
-        if loan is None:
-            continue
-        safe_loan = {
-            "type": loan.get("type", "Loan"),
-            "lender": loan.get("lender", "Unknown"),
-            "amount": loan.get("amount", 0),
-            "current_balance": loan.get("current_balance", 0),
-            "emi": loan.get("emi", 0),
-            "interest_rate": loan.get("interest_rate", 0),
-            "tenure": loan.get("tenure", 0),
-            "remaining_tenure": loan.get("remaining_tenure", 0)
-        }
-        safe_loans.append(safe_loan)
-    
-    safe_cards = []
-    for card in credit_cards:
-        if card is None:
-            continue
-        safe_card = {
-            "issuer": card.get("issuer", "Unknown"),
-            "limit": card.get("limit", 0),
-            "outstanding": card.get("outstanding", 0),
-            "minimum_due": card.get("minimum_due", 0)
-        }
-        safe_cards.append(safe_card)
     
-    prompt = f"""
-    As a financial advisor, respond to this query from someone with the following financial profile in India:
+    context = f"""
+    As a financial advisor, respond to queries from someone with the following financial profile in India:
     
     Credit Score: {credit_score}
     Monthly Income: ₹{income:,}
-    Loans: {json.dumps(safe_loans, indent=2)}
-    Credit Cards: {json.dumps(safe_cards, indent=2)}
-    
-    User's Question: "{user_query}"
+    Loans: {_compact_records(loans, "emi", "in monthly EMIs")}
+    Credit Cards: {_compact_records(credit_cards, "outstanding", "outstanding")}
     
     Please provide specific, personalized advice that:
     1. Directly addresses their question with Indian financial context
@@ -285,11 +771,80 @@ def provide_financial_advice(credit_info, user_query):
     Format your response with clear headings and bullet points.
     Include specific numbers and calculations to support your advice.
     """
-    return get_chatgpt_response(prompt)
+    return context
+
+def _financial_advice_prompt(user_query):
+    """Build the user message for a financial advice query"""
+    return f'User\'s Question: "{user_query}"'
+
+def stream_financial_advice(credit_info_json, user_query):
+    """Stream personalized financial advice for a user query as tokens arrive
+    
+    A previous answer to the same or a similar question about the same
+    profile is yielded whole instead of calling the API.
+    """
+    context = _advisor_context(credit_info_json)
+    prompt = _financial_advice_prompt(user_query)
+    
+    # An exact repeat needs no embedding request
+    answer = _response_cache().get(_response_key(prompt, context=context))
+    if answer is not None:
+        yield answer
+        return
+    
+    answer, embedding = semantic_lookup(user_query, context)
+    if answer is not None:
+        yield answer
+        return
+    
+    yield from stream_chatgpt_response(prompt, context=context)
+    
+    # Only completed answers reach the response cache, so errors are never indexed
+    answer = _response_cache().get(_response_key(prompt, context=context))
+    if answer is not None and embedding is not None:
+        semantic_store([user_query], embedding[np.newaxis], [answer], context)
+
+# Preset Financial Advisor questions: (button label, question shown in chat, question sent to the model)
+COMMON_QUESTIONS = [
+    ("💰 Should I pay off my debt or invest?",
+     "Should I pay off my debt or invest my extra money?",
+     "Should I pay off my debt or invest my extra money? Please do the math based on my current loans and income."),
+    ("🏠 How much house can I afford?",
+     "How much house can I afford based on my income and current EMIs?",
+     "How much house can I afford based on my income and current EMIs? What would be my maximum affordable home loan amount?"),
+    ("📈 How can I improve my credit score?",
+     "How can I improve my credit score quickly?",
+     "How can I improve my credit score quickly? Give me specific steps based on my current credit profile."),
+    ("💳 Should I take a personal loan?",
+     "Is it a good idea for me to take a personal loan right now?",
+     "Is it a good idea for me to take a personal loan right now based on my financial situation? What amount would be safe for me to borrow?")
+]
+
+def precompute_common_answers(credit_info_json):
+    """Answer all COMMON_QUESTIONS for a profile, requesting uncached answers concurrently
+    
+    Returns a dict of model question to answer; questions whose request
+    failed are left out so they can be asked again live.
+    """
+    questions = [question for _, _, question in COMMON_QUESTIONS]
+    prompts = [_financial_advice_prompt(question) for question in questions]
+    context = _advisor_context(credit_info_json)
+    answers = {question: answer for question, answer in zip(questions, complete_all(prompts, context))
+               if answer is not None}
+    
+    # Index the answers so similar free-form questions can reuse them
+    if answers:
+        try:
+            semantic_store(list(answers), _embed(list(answers)), list(answers.values()), context)
+        except Exception as e:
+            print(f"Error indexing common answers: {str(e)}")
+    
+    return answers
 
 # Generate sample credit card database
+@st.cache_resource
 def generate_credit_card_database():
-    """Generate a database of sample credit cards"""
+    """Generate a read-only database of sample credit cards"""
     cards = []
     
     # Travel cards
@@ -320,10 +875,37 @@ def generate_credit_card_database():
     # More card entries (truncated for brevity)
     # Add more cards as needed from the original code
     
-    return cards
+    # The database is shared by every session through st.cache_resource, so freeze it
+    return tuple(types.MappingProxyType({**card, "benefits": tuple(card["benefits"])}) for card in cards)
 
-def get_suitable_cards(credit_score, monthly_income, preferences, card_database):
-    """Filter credit cards based on user's profile and preferences with robust NoneType handling"""
+# Card categories users can choose as preferences
+CARD_PREFERENCES = ["travel", "shopping", "fuel", "premium", "lifestyle", "business", "starter", "secured", "student"]
+
+@st.cache_resource
+def card_dataframe():
+    """Build the card database as a DataFrame once per process for vectorized filtering
+    
+    Returns the cards and a boolean matrix with one column per entry in
+    CARD_PREFERENCES, marking the cards in that category.
+    """
+    import pandas as pd
+    
+    df = pd.DataFrame(generate_credit_card_database()).fillna(
+        {"credit_score_requirement": 0, "income_requirement": 0, "category": ""})
+    
+    # A card's category may be a single name or a list of names
+    categories = df.category.map(lambda category: frozenset([category] if isinstance(category, str) else category))
+    preference_matrix = pd.DataFrame(
+        {preference: categories.map(lambda names: preference in names) for preference in CARD_PREFERENCES},
+        index=df.index)
+    return df, preference_matrix
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def get_suitable_cards(credit_score, monthly_income, preferences):
+    """Filter credit cards based on user's profile and preferences with robust NoneType handling
+
+    Pass preferences as a sorted tuple so equivalent selections share a cache entry.
+    """
     # Handle None inputs
     if credit_score is None:
         credit_score = 700
@@ -331,28 +913,21 @@ def get_suitable_cards(credit_score, monthly_income, preferences, card_database)
         monthly_income = 50000
     
     annual_income = monthly_income * 12
-    suitable_cards = []
-    
-    for card in card_database:
-        # Get card requirements with defaults
-        card_score_req = card.get("credit_score_requirement", 0)
-        card_income_req = card.get("income_requirement", 0)
-        card_category = card.get("category", "")
-        
-        # Filter by credit score and income requirements
-        if card_score_req <= credit_score and card_income_req <= annual_income:
-            # Add card if there are no specific preferences or if card matches preferences
-            if not preferences or card_category in preferences:
-                suitable_cards.append(card)
+    df, preference_matrix = card_dataframe()
     
-    # Sort by most suitable (higher income/credit score requirements first as they typically have better benefits)
-    suitable_cards.sort(key=lambda x: (x.get("income_requirement", 0), x.get("credit_score_requirement", 0)), reverse=True)
+    # Filter by credit score and income requirements, and by preferences if any were given
+    mask = (df.credit_score_requirement <= credit_score) & (df.income_requirement <= annual_income)
+    if preferences:
+        mask &= preference_matrix.reindex(columns=list(preferences), fill_value=False).any(axis=1)
     
-    # Return top 5 cards or all if less than 5
-    return suitable_cards[:5]
+    # Top 5 by suitability (higher income/credit score requirements first as they typically have better benefits)
+    return df[mask].nlargest(5, ["income_requirement", "credit_score_requirement"]).to_dict("records")
 
+@st.cache_data(max_entries=64, show_spinner=False)
 def visualize_credit_score(credit_score):
     """Create a gauge chart for credit score visualization"""
+    import plotly.graph_objects as go
+    
     if credit_score is None:
         credit_score = 700
         
@@ -385,48 +960,16 @@ def visualize_credit_score(credit_score):
     
     return fig
 
-def visualize_debt_to_income(credit_info):
+@st.cache_data(max_entries=64, show_spinner=False)
+def visualize_debt_to_income(monthly_debt, income, essentials, wants, savings):
     """Create a visualization for debt-to-income ratio"""
+    import plotly.graph_objects as go
+    
     try:
-        # Safely get loan and card lists
-        loans = credit_info.get("loans", [])
-        if loans is None:
-            loans = []
-            
-        credit_cards = credit_info.get("credit_cards", [])
-        if credit_cards is None:
-            credit_cards = []
-        
-        # Safely calculate total EMI
-        total_emi = 0
-        for loan in loans:
-            if loan is None:
-                continue
-            emi = loan.get("emi")
-            if emi is not None and isinstance(emi, (int, float)):
-                total_emi += emi
-        
-        # Safely calculate card dues
-        card_minimum_dues = 0
-        for card in credit_cards:
-            if card is None:
-                continue
-            min_due = card.get("minimum_due")
-            if min_due is not None and isinstance(min_due, (int, float)):
-                card_minimum_dues += min_due
-        
-        monthly_debt = total_emi + card_minimum_dues
-        
-        # Ensure income is a number, not None
-        income = credit_info.get("income")
-        if income is None or not isinstance(income, (int, float)) or income <= 0:
+        # Scalar inputs keep the cache key cheap to hash
+        if income is None:
             income = 50000  # Default value for display
         
-        # Calculate recommended allocation using 50-30-20 rule
-        essentials = income * 0.5
-        wants = income * 0.3
-        savings = income * 0.2
-        
         # Create stacked bar chart
         fig = go.Figure()
         
@@ -486,54 +1029,255 @@ def visualize_debt_to_income(credit_info):
         )
         return fig
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def visualize_amortization(principal, rate_bps, tenure_years):
+    """Create a line chart of the outstanding loan balance over the tenure"""
+    import plotly.graph_objects as go
+    
+    # Keyed by the slider values rather than the balance array so the cache key stays cheap
+    _, _, balance = emi_schedule(principal, rate_bps, tenure_years)
+    
+    fig = go.Figure(go.Scatter(
+        x=np.arange(1, len(balance) + 1),
+        y=balance,
+        mode="lines",
+        line={"color": "#2196F3"},
+        fill="tozeroy",
+        name="Outstanding Balance"
+    ))
+    
+    fig.update_layout(
+        title="Outstanding Balance by Month",
+        height=300,
+        xaxis_title="Month",
+        yaxis_title="Balance (₹)",
+        margin=dict(l=10, r=10, t=40, b=10),
+        paper_bgcolor="white",
+        plot_bgcolor="white",
+        font={"color": "darkblue", "family": "Arial"}
+    )
+    
+    return fig
+
+# Sample credit report used for the demo data and the format examples
+SAMPLE_DATA = {
+    "credit_score": 750,
+    "income": 150000,
+    "loans": [
+        {
+            "type": "Home Loan",
+            "lender": "HDFC Bank",
+            "amount": 5000000,
+            "current_balance": 3500000,
+            "emi": 40000,
+            "interest_rate": 7.5,
+            "tenure": 240,
+            "remaining_tenure": 180
+        },
+        {
+            "type": "Personal Loan",
+            "lender": "ICICI Bank",
+            "amount": 500000,
+            "current_balance": 300000,
+            "emi": 15000,
+            "interest_rate": 12.0,
+            "tenure": 36,
+            "remaining_tenure": 24
+        }
+    ],
+    "credit_cards": [
+        {
+            "issuer": "ICICI Bank",
+            "limit": 300000,
+            "outstanding": 50000,
+            "minimum_due": 2500
+        },
+        {
+            "issuer": "SBI Card",
+            "limit": 200000,
+            "outstanding": 30000,
+            "minimum_due": 1500
+        }
+    ],
+    "payment_history": [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    "inquiries": 2
+}
+
+# Pretty-printed once at import for the "Sample Credit Report Format" displays
+SAMPLE_JSON_STR = orjson.dumps(SAMPLE_DATA, option=orjson.OPT_INDENT_2).decode()
+
+@st.cache_data(show_spinner=False)
 def load_sample_data():
     """Load sample data for demonstration"""
-    sample_data = {
-        "credit_score": 750,
-        "income": 150000,
-        "loans": [
-            {
-                "type": "Home Loan",
-                "lender": "HDFC Bank",
-                "amount": 5000000,
-                "current_balance": 3500000,
-                "emi": 40000,
-                "interest_rate": 7.5,
-                "tenure": 240,
-                "remaining_tenure": 180
-            },
-            {
-                "type": "Personal Loan",
-                "lender": "ICICI Bank",
-                "amount": 500000,
-                "current_balance": 300000,
-                "emi": 15000,
-                "interest_rate": 12.0,
-                "tenure": 36,
-                "remaining_tenure": 24
-            }
-        ],
-        "credit_cards": [
-            {
-                "issuer": "ICICI Bank",
-                "limit": 300000,
-                "outstanding": 50000,
-                "minimum_due": 2500
-            },
-            {
-                "issuer": "SBI Card",
-                "limit": 200000,
-                "outstanding": 30000,
-                "minimum_due": 1500
-            }
-        ],
-        "payment_history": [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-        "inquiries": 2
-    }
-    return sample_data
+    # st.cache_data hands back a copy, so callers can't mutate SAMPLE_DATA
+    return SAMPLE_DATA
+
+# Session artifacts are saved on disk under a session id kept in the URL, so reloading the page restores them
+# The sid in the URL is the only thing protecting a saved report, so anyone with the link can open it
+SESSION_CACHE_DIR = ".session_cache"
+SESSION_TTL = 7 * 86400
+PERSISTED_SESSION_KEYS = ("credit_info", "credit_info_json", "metrics", "card_preferences", "chat_history",
+                          "credit_score_analysis", "emi_analysis", "card_recommendations", "common_answers")
+
+# Bump when the saved keys or their formats change, so older snapshots are ignored
+SESSION_SCHEMA_VERSION = 2
+REQUIRED_SESSION_KEYS = ("credit_info", "credit_info_json", "metrics")
+
+@st.cache_resource
+def _session_store():
+    """Open the on-disk store of saved sessions"""
+    import diskcache
+    return diskcache.Cache(SESSION_CACHE_DIR)
+
+def restore_session():
+    """Assign the browser session a stable id and restore its saved artifacts, once per session"""
+    if "sid" in st.session_state:
+        return
+    
+    sid = st.query_params.get("sid") or uuid.uuid4().hex
+    st.query_params["sid"] = sid
+    st.session_state.sid = sid
+    
+    blob = _session_store().get(sid)
+    if blob is None:
+        return
+    
+    # An unreadable, outdated or incomplete snapshot starts a fresh session instead of breaking every load
+    try:
+        saved = pickle.loads(blob)
+    except Exception as e:
+        print(f"Error restoring session {sid}: {str(e)}")
+        return
+    if not isinstance(saved, dict) or saved.get("version") != SESSION_SCHEMA_VERSION:
+        return
+    state = saved.get("state")
+    if not isinstance(state, dict) or any(state.get(key) is None for key in REQUIRED_SESSION_KEYS):
+        return
+    
+    st.session_state.update(state)
+    st.session_state._persisted_digest = hashlib.blake2b(blob).digest()
+
+def persist_session():
+    """Save the tracked session artifacts if they changed since they were last saved
+    
+    Nothing is saved until a report has been loaded, since there is nothing to restore.
+    """
+    if st.session_state.get("credit_info") is None:
+        return
+    
+    snapshot = {key: st.session_state[key] for key in PERSISTED_SESSION_KEYS if key in st.session_state}
+    blob = pickle.dumps({"version": SESSION_SCHEMA_VERSION, "state": snapshot})
+    digest = hashlib.blake2b(blob).digest()
+    if st.session_state.get("_persisted_digest") != digest:
+        _session_store().set(st.session_state.sid, blob, expire=SESSION_TTL)
+        st.session_state._persisted_digest = digest
+
+# Chat history keeps at most CHAT_HISTORY_LIMIT messages, showing the latest CHAT_RECENT_MESSAGES expanded
+CHAT_HISTORY_LIMIT = 50
+CHAT_RECENT_MESSAGES = 20
+
+def _chat_bubble(message):
+    """Render one chat history message"""
+    if message["role"] == "user":
+        st.chat_message("user").write(message["content"])
+    else:
+        st.chat_message("assistant", avatar="🤖").write(message["content"])
+
+@st.fragment
+def _advisor_fragment(credit_info_json):
+    """Render the Financial Advisor chat
+    
+    Running as a fragment, chat input and question buttons rerun only this
+    section instead of the whole app.
+    """
+    # Display chat history, keeping all but the most recent messages collapsed
+    history = list(st.session_state.chat_history)
+    older, recent = history[:-CHAT_RECENT_MESSAGES], history[-CHAT_RECENT_MESSAGES:]
+    if older:
+        with st.expander(f"Older messages ({len(older)})"):
+            for message in older:
+                _chat_bubble(message)
+    for message in recent:
+        _chat_bubble(message)
+    
+    # Messages from question buttons are drawn here, in order after the history
+    new_messages = st.container()
+    
+    # Chat input
+    user_question = st.chat_input("Ask me anything about your financial situation...")
+    
+    if user_question:
+        # Add user message to chat history
+        st.session_state.chat_history.append({"role": "user", "content": user_question})
+    
+        # Display user message immediately
+        st.chat_message("user").write(user_question)
+    
+        # Stream AI response as it is generated
+        with st.chat_message("assistant", avatar="🤖"):
+            try:
+                ai_response = st.write_stream(stream_financial_advice(credit_info_json, user_question))
+    
+                # Add AI response to chat history
+                st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
+            except Exception as e:
+                error_message = f"Sorry, I couldn't generate financial advice at the moment. Error: {str(e)}"
+                st.error(error_message)
+                st.session_state.chat_history.append({"role": "assistant", "content": error_message})
+    
+    # Predefined financial questions
+    st.subheader("Common Financial Questions")
+    col1, col2 = st.columns(2)
+    common_answers = st.session_state.get("common_answers", {})
+    
+    clicked = None
+    for index, (label, query, question) in enumerate(COMMON_QUESTIONS):
+        with col1 if index < 2 else col2:
+            if st.button(label):
+                clicked = (query, question)
+    
+    if clicked:
+        query, question = clicked
+        st.session_state.chat_history.append({"role": "user", "content": query})
+        new_messages.chat_message("user").write(query)
+        
+        # Render in place rather than rerunning the app to show the new messages
+        with new_messages.chat_message("assistant", avatar="🤖"):
+            ai_response = common_answers.get(question)
+            if ai_response is None:
+                # No precomputed answer, so stream one live
+                ai_response = st.write_stream(stream_financial_advice(credit_info_json, question))
+            else:
+                st.write(ai_response)
+        st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
+    
+    # Answer all common questions in one concurrent batch after the page has rendered,
+    # so later button clicks need no API call
+    if "common_answers" not in st.session_state:
+        with st.spinner("Preparing answers to common questions..."):
+            st.session_state.common_answers = precompute_common_answers(credit_info_json)
+    
+    # Fragment reruns skip the end of main(), so save the new messages here
+    persist_session()
+
+# Static page content, rendered one markdown element per column
+KEY_FEATURES = [
+    ("📊 Credit Analysis", "Understand what factors are affecting your credit score and how to improve it"),
+    ("💰 EMI Calculator", "Plan your loans with our advanced EMI calculator and affordability analysis"),
+    ("💳 Card Recommendations", "Get personalized credit card suggestions based on your financial profile"),
+    ("🤖 AI Financial Advisor", "Get expert financial advice tailored to your specific financial situation")
+]
+
+COMING_SOON_FEATURES = [
+    ("🔄 **Direct CIBIL Integration**", "One-click connectivity with Transunion CIBIL report"),
+    ("📄 **PDF Support**", "Upload credit reports in PDF format")
+]
 
 # Main application UI
 def main():
+    # Restore the artifacts of a previous visit before anything reads session state
+    restore_session()
+    
     # Initialize all variables
     income = 0
     credit_score = 0
@@ -560,7 +1304,7 @@ def main():
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Load Sample Report"):
-                st.session_state.credit_info = load_sample_data()
+                store_credit_info(load_sample_data())
                 st.success("Sample report loaded successfully!")
                 st.rerun()
         
@@ -575,33 +1319,7 @@ def main():
         # Display sample JSON if button was clicked
         if "show_sample_json" in st.session_state and st.session_state.show_sample_json:
             st.subheader("Sample Credit Report Format (JSON)")
-            sample_json = {
-                "credit_score": 750,
-                "income": 150000,
-                "loans": [
-                    {
-                        "type": "Home Loan",
-                        "lender": "HDFC Bank",
-                        "amount": 5000000,
-                        "current_balance": 3500000,
-                        "emi": 40000,
-                        "interest_rate": 7.5,
-                        "tenure": 240,
-                        "remaining_tenure": 180
-                    }
-                ],
-                "credit_cards": [
-                    {
-                        "issuer": "ICICI Bank",
-                        "limit": 300000,
-                        "outstanding": 50000,
-                        "minimum_due": 2500
-                    }
-                ],
-                "payment_history": [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-                "inquiries": 2
-            }
-            st.code(json.dumps(sample_json, indent=2), language="json")
+            st.code(SAMPLE_JSON_STR, language="json")
             
             # Add a button to hide the sample JSON
             if st.button("Hide Sample JSON"):
@@ -618,6 +1336,9 @@ def main():
         4. Get credit card recommendations
         5. Ask questions to our AI financial advisor
         """)
+        
+        st.caption("🔒 Your report, analyses and chat are saved for 7 days under this page's link. "
+                   "Anyone with the link can open them, so don't share it.")
     
     # Main content
     st.title("Financial Assistant")
@@ -627,7 +1348,7 @@ def main():
         st.session_state.credit_info = None
     
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_LIMIT)
     
     if "card_preferences" not in st.session_state:
         st.session_state.card_preferences = []
@@ -644,14 +1365,11 @@ def main():
             if st.button("🔍 Analyze Report", type="primary"):
                 with st.spinner("Analyzing your credit report..."):
                     try:
-                        # Read JSON from uploaded file
-                        credit_data = json.load(uploaded_file)
+                        # Parse the uploaded bytes directly; getvalue() doesn't depend on the read position
+                        credit_data = orjson.loads(uploaded_file.getvalue())
                         
-                        # Extract credit information
-                        credit_info = extract_credit_info(credit_data)
-                        
-                        # Store in session state
-                        st.session_state.credit_info = credit_info
+                        # Extract credit information and store it with its debt metrics
+                        store_credit_info(credit_data)
                         
                         # Clear previous analyses when a new report is uploaded
                         if "credit_score_analysis" in st.session_state:
@@ -661,7 +1379,7 @@ def main():
                         if "card_recommendations" in st.session_state:
                             del st.session_state.card_recommendations
                         
-                        st.session_state.chat_history = []
+                        st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_LIMIT)
                         
                         st.success("Credit report analyzed successfully!")
                         st.rerun()
@@ -671,13 +1389,8 @@ def main():
     with col1:
         # Coming Soon Features Section
         st.info("🔜 **Coming Soon Features**")
-        cols = st.columns(4)
-        with cols[0]:
-            st.write("🔄 **Direct CIBIL Integration**")
-            st.write("One-click connectivity with Transunion CIBIL report")
-        with cols[1]:
-            st.write("📄 **PDF Support**")
-            st.write("Upload credit reports in PDF format")
+        for col, (title, description) in zip(st.columns(4), COMING_SOON_FEATURES):
+            col.markdown(f"{title}\n\n{description}")
         st.caption("*We're currently in beta phase, working hard to bring you these exciting new features!*")
     
     # Display main content based on navigation selection
@@ -687,102 +1400,30 @@ def main():
         
         # Key features
         st.subheader("Key Features")
-        cols = st.columns(4)
-        
-        with cols[0]:
-            st.write("### 📊 Credit Analysis")
-            st.write("Understand what factors are affecting your credit score and how to improve it")
-        
-        with cols[1]:
-            st.write("### 💰 EMI Calculator")
-            st.write("Plan your loans with our advanced EMI calculator and affordability analysis")
-        
-        with cols[2]:
-            st.write("### 💳 Card Recommendations")
-            st.write("Get personalized credit card suggestions based on your financial profile")
-        
-        with cols[3]:
-            st.write("### 🤖 AI Financial Advisor")
-            st.write("Get expert financial advice tailored to your specific financial situation")
+        for col, (title, description) in zip(st.columns(4), KEY_FEATURES):
+            col.markdown(f"### {title}\n{description}")
         
         # Sample JSON structure
         st.subheader("Sample Credit Report Format (JSON)")
-        sample_json = {
-            "credit_score": 750,
-            "income": 150000,
-            "loans": [
-                {
-                    "type": "Home Loan",
-                    "lender": "HDFC Bank",
-                    "amount": 5000000,
-                    "current_balance": 3500000,
-                    "emi": 40000,
-                    "interest_rate": 7.5,
-                    "tenure": 240,
-                    "remaining_tenure": 180
-                }
-            ],
-            "credit_cards": [
-                {
-                    "issuer": "ICICI Bank",
-                    "limit": 300000,
-                    "outstanding": 50000,
-                    "minimum_due": 2500
-                }
-            ],
-            "payment_history": [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            "inquiries": 2
-        }
-        st.code(json.dumps(sample_json, indent=2), language="json")
+        st.code(SAMPLE_JSON_STR, language="json")
     
     # Check if credit info is available and display appropriate content
     elif st.session_state.credit_info:
         credit_info = st.session_state.credit_info
+        metrics = st.session_state.metrics
         
         # Summary card with key metrics if we're on the home page
         if nav_option == "Home":
             st.subheader("📊 Financial Summary")
-            cols = st.columns(4)
             
-            with cols[0]:
-                credit_score = credit_info.get('credit_score')
-                if credit_score is not None:
-                    st.metric("Credit Score", f"{credit_score}", 
-                             delta="Excellent" if credit_score >= 750 else 
-                             "Good" if credit_score >= 700 else
-                             "Fair" if credit_score >= 650 else "Poor")
-                else:
-                    st.metric("Credit Score", "N/A", delta="Unknown")
-            
-            with cols[1]:
-                income = credit_info.get('income', 0)
-                if income:
-                    st.metric("Monthly Income", f"₹{income:,}")
-                else:
-                    st.metric("Monthly Income", "N/A")
-            
-            with cols[2]:
-                loans = credit_info.get('loans', [])
-                if loans is None:
-                    loans = []
-                total_emi = sum(loan.get("emi", 0) for loan in loans if loan is not None)
-                st.metric("Total Monthly EMIs", f"₹{total_emi:,}")
+            # Rebuild the summary tiles only when a different report has been loaded; keyed by content,
+            # since id() of a replaced report can be reused by the next one
+            if st.session_state.get("_summary_cache_key") != st.session_state.credit_info_json:
+                st.session_state._summary_metrics = summary_tiles(credit_info, metrics)
+                st.session_state._summary_cache_key = st.session_state.credit_info_json
             
-            with cols[3]:
-                credit_cards = credit_info.get('credit_cards', [])
-                if credit_cards is None:
-                    credit_cards = []
-                card_minimum_dues = sum(card.get("minimum_due", 0) for card in credit_cards if card is not None)
-                monthly_debt = total_emi + card_minimum_dues
-                income = credit_info.get('income', 0)
-                if income is None or not isinstance(income, (int, float)) or income <= 0:
-                    income = 1  # Avoid division by zero
-                debt_to_income_ratio = (monthly_debt / income) * 100 if income > 0 else 0
-                st.metric("Debt-to-Income Ratio", f"{debt_to_income_ratio:.1f}%", 
-                         delta="Healthy" if debt_to_income_ratio <= 40 else 
-                         "Moderate" if debt_to_income_ratio <= 60 else "High", 
-                         delta_color="normal" if debt_to_income_ratio <= 40 else 
-                         "off" if debt_to_income_ratio <= 60 else "inverse")
+            for col, tile in zip(st.columns(4), st.session_state._summary_metrics):
+                col.metric(**tile)
         
         # Credit Score Analysis Tab
         if nav_option == "Credit Score Analysis":
@@ -798,20 +1439,21 @@ def main():
                     st.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                # Display credit score analysis from ChatGPT
-                if "credit_score_analysis" not in st.session_state:
-                    with st.spinner("Analyzing your credit score..."):
-                        st.session_state.credit_score_analysis = analyze_credit_score(credit_info)
-                
                 # Analysis box
                 st.subheader("AI Credit Score Analysis")
-                st.write(st.session_state.credit_score_analysis)
                 
-                # Add a "Refresh Analysis" button
-                if st.button("🔄 Refresh Credit Score Analysis"):
-                    with st.spinner("Refreshing credit score analysis..."):
-                        st.session_state.credit_score_analysis = analyze_credit_score(credit_info)
-                        st.rerun()
+                # The analysis is drawn above its refresh button, which is read first so a refresh streams in place
+                analysis_box = st.container()
+                refresh = st.button("🔄 Refresh Credit Score Analysis")
+                
+                with analysis_box:
+                    if refresh:
+                        st.session_state.credit_score_analysis = st.write_stream(analyze_credit_score(credit_info, refresh=True))
+                    # Otherwise stream credit score analysis from ChatGPT the first time, then reuse it
+                    elif "credit_score_analysis" not in st.session_state:
+                        st.session_state.credit_score_analysis = st.write_stream(analyze_credit_score(credit_info))
+                    else:
+                        st.write(st.session_state.credit_score_analysis)
         
         # EMI Affordability Tab
         elif nav_option == "EMI Affordability":
@@ -821,7 +1463,8 @@ def main():
             
             with col1:
                 # Visualizations
-                fig = visualize_debt_to_income(credit_info)
+                fig = visualize_debt_to_income(metrics["monthly_debt"], metrics["income"],
+                                               metrics["essentials"], metrics["wants"], metrics["savings"])
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # EMI calculator
@@ -830,34 +1473,37 @@ def main():
                 interest_rate = st.slider("Interest Rate (%)", 5.0, 20.0, 10.0, step=0.1)
                 loan_tenure = st.slider("Loan Tenure (Years)", 1, 30, 5)
                 
-                # Calculate EMI
-                monthly_interest_rate = interest_rate / (12 * 100)
-                tenure_months = loan_tenure * 12
-                emi = loan_amount * monthly_interest_rate * ((1 + monthly_interest_rate) ** tenure_months) / (((1 + monthly_interest_rate) ** tenure_months) - 1)
+                # Work in whole basis points; round() rather than int(), which would turn 7.3% into 729
+                emi_key = (loan_amount, round(interest_rate * 100), loan_tenure)
                 
-                st.metric("Calculated Monthly EMI", f"₹{emi:,.2f}")
-                
-                # Calculate total interest payable
-                total_payment = emi * tenure_months
-                total_interest = total_payment - loan_amount
+                # Calculate EMI and total interest payable, only when the slider values changed
+                if st.session_state.get("emi_key") != emi_key:
+                    st.session_state.emi_result = _emi(*emi_key)
+                    st.session_state.emi_key = emi_key
+                emi, total_interest = st.session_state.emi_result
                 
+                st.metric("Calculated Monthly EMI", f"₹{emi:,.2f}")
                 st.metric("Total Interest Payable", f"₹{total_interest:,.2f}")
+                
+                fig = visualize_amortization(*emi_key)
+                st.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                # Display EMI affordability analysis from ChatGPT
-                if "emi_analysis" not in st.session_state:
-                    with st.spinner("Analyzing your EMI affordability..."):
-                        st.session_state.emi_analysis = analyze_emi_affordability(credit_info)
-                
                 # Enhanced styled box for the EMI analysis
                 st.subheader("AI EMI Affordability Analysis")
-                st.write(st.session_state.emi_analysis)
                 
-                # Add a "Refresh Analysis" button
-                if st.button("🔄 Refresh EMI Analysis"):
-                    with st.spinner("Refreshing EMI analysis..."):
-                        st.session_state.emi_analysis = analyze_emi_affordability(credit_info)
-                        st.rerun()
+                # The analysis is drawn above its refresh button, which is read first so a refresh streams in place
+                analysis_box = st.container()
+                refresh = st.button("🔄 Refresh EMI Analysis")
+                
+                with analysis_box:
+                    if refresh:
+                        st.session_state.emi_analysis = st.write_stream(analyze_emi_affordability(credit_info, metrics, refresh=True))
+                    # Otherwise stream EMI affordability analysis from ChatGPT the first time, then reuse it
+                    elif "emi_analysis" not in st.session_state:
+                        st.session_state.emi_analysis = st.write_stream(analyze_emi_affordability(credit_info, metrics))
+                    else:
+                        st.write(st.session_state.emi_analysis)
         
         # Card Recommendations Tab
         elif nav_option == "Card Recommendations":
@@ -867,20 +1513,19 @@ def main():
             st.subheader("What are your credit card preferences?")
             preferences = st.multiselect(
                 "Select your preferences (you can select multiple)",
-                ["travel", "shopping", "fuel", "premium", "lifestyle", "business", "starter", "secured", "student"],
+                CARD_PREFERENCES,
                 default=st.session_state.card_preferences
             )
             
-            preference_changed = st.session_state.card_preferences != preferences
+            # Compare as sets so reordering the same selection doesn't regenerate recommendations
+            preference_changed = frozenset(st.session_state.card_preferences) != frozenset(preferences)
             
-            # Update session state
+            # Update session state, stored sorted so the selection has one canonical form
+            preferences = sorted(preferences)
             st.session_state.card_preferences = preferences
             
-            # Generate credit card database
-            card_database = generate_credit_card_database()
-            
             # Get suitable cards
-            suitable_cards = get_suitable_cards(credit_info.get("credit_score"), credit_info.get("income"), preferences, card_database)
+            suitable_cards = get_suitable_cards(credit_info.get("credit_score"), credit_info.get("income"), tuple(preferences))
             
             # Display cards
             if suitable_cards:
@@ -890,32 +1535,38 @@ def main():
                     with st.expander(f"{card['name']} by {card['issuer']}"):
                         col1, col2 = st.columns([1, 3])
                         
-                        with col1:
-                            st.write(f"**{card['issuer']}**")
-                            st.write(f"**Annual Fee:** ₹{card['annual_fee']:,}")
-                            st.write(f"**Min. Credit Score:** {card['credit_score_requirement']}")
-                            st.write(f"**Min. Annual Income:** ₹{card['income_requirement']:,}")
-                            if card['welcome_offer'] != "None":
-                                st.write(f"**Welcome Offer:** {card['welcome_offer']}")
+                        # One markdown element per column, with hard line breaks between the details
+                        details = [
+                            f"**{card['issuer']}**",
+                            f"**Annual Fee:** ₹{card['annual_fee']:,}",
+                            f"**Min. Credit Score:** {card['credit_score_requirement']}",
+                            f"**Min. Annual Income:** ₹{card['income_requirement']:,}"
+                        ]
+                        if card['welcome_offer'] != "None":
+                            details.append(f"**Welcome Offer:** {card['welcome_offer']}")
+                        col1.markdown("  \n".join(details))
                         
-                        with col2:
-                            st.write("**Key Benefits:**")
-                            for benefit in card['benefits']:
-                                st.write(f"- {benefit}")
+                        benefits = "\n".join(f"- {benefit}" for benefit in card['benefits'])
+                        col2.markdown(f"**Key Benefits:**\n\n{benefits}")
             
-                # Get detailed AI recommendations
-                if "card_recommendations" not in st.session_state or preference_changed:
-                    with st.spinner("Getting personalized card recommendations..."):
-                        st.session_state.card_recommendations = recommend_credit_cards(credit_info, preferences)
-                
                 st.subheader("Detailed Analysis and Recommendations")
-                st.write(st.session_state.card_recommendations)
                 
-                # Add a "Refresh Recommendations" button
-                if st.button("🔄 Refresh Card Recommendations"):
-                    with st.spinner("Refreshing card recommendations..."):
-                        st.session_state.card_recommendations = recommend_credit_cards(credit_info, preferences)
-                        st.rerun()
+                # Only request AI recommendations once there are preferences to personalize for
+                if not preferences:
+                    st.info(NO_CARD_PREFERENCES_MESSAGE)
+                else:
+                    # The analysis is drawn above its refresh button, which is read first so a refresh streams in place
+                    analysis_box = st.container()
+                    refresh = st.button("🔄 Refresh Card Recommendations")
+                    
+                    with analysis_box:
+                        if refresh:
+                            st.session_state.card_recommendations = st.write_stream(recommend_credit_cards(credit_info, preferences, refresh=True))
+                        # Otherwise stream detailed AI recommendations, regenerating when preferences change
+                        elif "card_recommendations" not in st.session_state or preference_changed:
+                            st.session_state.card_recommendations = st.write_stream(recommend_credit_cards(credit_info, preferences))
+                        else:
+                            st.write(st.session_state.card_recommendations)
             else:
                 st.warning("Based on your credit profile, we couldn't find suitable credit cards. Please improve your credit score or income to qualify for credit cards.")
         
@@ -923,74 +1574,24 @@ def main():
         elif nav_option == "Financial Advisor":
             st.header("Personal Finance Manager")
             
-            # Display chat history
-            for message in st.session_state.chat_history:
-                if message["role"] == "user":
-                    st.chat_message("user").write(message["content"])
-                else:
-                    st.chat_message("assistant", avatar="🤖").write(message["content"])
-            
-            # Chat input
-            user_question = st.chat_input("Ask me anything about your financial situation...")
-            
-            if user_question:
-                # Add user message to chat history
-                st.session_state.chat_history.append({"role": "user", "content": user_question})
-                
-                # Display user message immediately
-                st.chat_message("user").write(user_question)
-                
-                # Get AI response
-                with st.chat_message("assistant", avatar="🤖"):
-                    with st.spinner("Getting financial advice..."):
-                        try:
-                            ai_response = provide_financial_advice(credit_info, user_question)
-                            st.write(ai_response)
-                            
-                            # Add AI response to chat history
-                            st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                        except Exception as e:
-                            error_message = f"Sorry, I couldn't generate financial advice at the moment. Error: {str(e)}"
-                            st.error(error_message)
-                            st.session_state.chat_history.append({"role": "assistant", "content": error_message})
-            
-            # Predefined financial questions
-            st.subheader("Common Financial Questions")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if st.button("💰 Should I pay off my debt or invest?"):
-                    query = "Should I pay off my debt or invest my extra money?"
-                    st.session_state.chat_history.append({"role": "user", "content": query})
-                    with st.spinner("Getting financial advice..."):
-                        ai_response = provide_financial_advice(credit_info, "Should I pay off my debt or invest my extra money? Please do the math based on my current loans and income.")
-                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                    st.rerun()
-                
-                if st.button("🏠 How much house can I afford?"):
-                    query = "How much house can I afford based on my income and current EMIs?"
-                    st.session_state.chat_history.append({"role": "user", "content": query})
-                    with st.spinner("Getting financial advice..."):
-                        ai_response = provide_financial_advice(credit_info, "How much house can I afford based on my income and current EMIs? What would be my maximum affordable home loan amount?")
-                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                    st.rerun()
-            
-            with col2:
-                if st.button("📈 How can I improve my credit score?"):
-                    query = "How can I improve my credit score quickly?"
-                    st.session_state.chat_history.append({"role": "user", "content": query})
-                    with st.spinner("Getting financial advice..."):
-                        ai_response = provide_financial_advice(credit_info, "How can I improve my credit score quickly? Give me specific steps based on my current credit profile.")
-                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                    st.rerun()
-                
-                if st.button("💳 Should I take a personal loan?"):
-                    query = "Is it a good idea for me to take a personal loan right now?"
-                    st.session_state.chat_history.append({"role": "user", "content": query})
-                    with st.spinner("Getting financial advice..."):
-                        ai_response = provide_financial_advice(credit_info, "Is it a good idea for me to take a personal loan right now based on my financial situation? What amount would be safe for me to borrow?")
-                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                    st.rerun()
+            _advisor_fragment(st.session_state.credit_info_json)
+        
+        # Once the open tab has streamed its own analysis, fetch the other tabs' analyses in one
+        # request, falling back to concurrent requests, so switching tabs needs no wait
+        analysis_keys = dict(zip(ANALYSIS_NAMES, ("credit_score_analysis", "emi_analysis", "card_recommendations")))
+        preferences = st.session_state.card_preferences
+        missing = [name for name, key in analysis_keys.items()
+                   if key not in st.session_state and (name != "cards" or preferences)]
+        if nav_option in ("Credit Score Analysis", "EMI Affordability", "Card Recommendations") and missing:
+            with st.spinner("Preparing your other analyses..."):
+                analyses = analyze_all(credit_info, metrics, preferences, missing)
+                if analyses is None:
+                    analyses = analyze_separately(credit_info, metrics, preferences, missing)
+            for key, analysis in zip(analysis_keys.values(), analyses):
+                if analysis is not None:
+                    st.session_state[key] = analysis
+    
+    persist_session()
 
 if __name__ == "__main__":
     main()